@@ -0,0 +1,114 @@
+"""Benchmark monthly owner statement generation.
+
+Render-only (no database needed):
+    python benchmark_statements.py --properties 500 --format pdf
+
+End-to-end through the Mongo job queue (uses a scratch database that is dropped afterwards):
+    MONGO_URL=mongodb://localhost:27017 python benchmark_statements.py --mongo --workers 8
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from statement_render import render_to_file, STATEMENT_FORMATS
+
+CATEGORIES = ['Limpeza', 'Manutenção', 'Água', 'Luz', 'Internet', 'Impostos', 'Condomínio']
+MONTH = '2026-01'
+
+
+def fake_transactions(user_id: str, property_id: str, count: int) -> list:
+    transactions = []
+    for _ in range(count):
+        is_income = random.random() < 0.4
+        transactions.append({
+            'id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'property_id': property_id,
+            'type': 'income' if is_income else 'expense',
+            'category': None if is_income else random.choice(CATEGORIES),
+            'amount': round(random.uniform(50, 3000), 2),
+            'description': None,
+            'date': MONTH,
+        })
+    return transactions
+
+
+async def bench_render(args, storage_dir: Path) -> float:
+    datasets = [fake_transactions('bench', f'prop-{n}', args.transactions) for n in range(args.properties)]
+    semaphore = asyncio.Semaphore(args.workers)
+
+    # Same offloading as StatementQueue.render, so --workers bounds concurrent render threads.
+    async def one(n, transactions):
+        async with semaphore:
+            await asyncio.to_thread(render_to_file, storage_dir / f'{n}.{args.format}',
+                                    args.format, f'Propriedade {n}', transactions, MONTH)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(n, t) for n, t in enumerate(datasets)))
+    return time.perf_counter() - start
+
+
+async def bench_mongo(args, storage_dir: Path) -> float:
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from statements import StatementQueue
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db_name = f'statements_bench_{uuid.uuid4().hex[:8]}'
+    db = client[db_name]
+    queue = StatementQueue(db, storage_dir, concurrency=args.workers, poll_interval=0.1)
+    try:
+        # Same indexes as production; the queue creates them on start-up.
+        await queue.ensure_indexes()
+        user_id = str(uuid.uuid4())
+        property_ids = [str(uuid.uuid4()) for _ in range(args.properties)]
+        await db.properties.insert_many([
+            {'id': pid, 'user_id': user_id, 'name': f'Propriedade {n}', 'type': 'airbnb'}
+            for n, pid in enumerate(property_ids)
+        ])
+        await db.transactions.insert_many([
+            t for pid in property_ids for t in fake_transactions(user_id, pid, args.transactions)
+        ])
+
+        start = time.perf_counter()
+        await queue.start()
+        for pid in property_ids:
+            await queue.enqueue(user_id, pid, MONTH, args.format)
+        while await db.statement_jobs.count_documents({'status': {'$in': ['queued', 'running']}}):
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - start
+
+        failed = await db.statement_jobs.count_documents({'status': 'failed'})
+        if failed:
+            print(f'{failed} jobs failed')
+        return elapsed
+    finally:
+        await queue.stop()
+        await client.drop_database(db_name)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--properties', type=int, default=500)
+    parser.add_argument('--transactions', type=int, default=40, help='transactions per property')
+    parser.add_argument('--format', choices=STATEMENT_FORMATS, default='pdf')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--mongo', action='store_true', help='run end-to-end through the Mongo job queue')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench = bench_mongo if args.mongo else bench_render
+        elapsed = asyncio.run(bench(args, Path(tmp)))
+
+    mode = 'queue' if args.mongo else 'render'
+    print(f'{mode}: {args.properties} {args.format} statements in {elapsed:.2f}s '
+          f'({args.properties / elapsed:.1f} statements/s, {args.workers} workers)')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi.responses import FileResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -12,6 +13,8 @@ import uuid
 from datetime import datetime, timezone, timedelta
 import bcrypt
 import jwt
+from statement_render import build_monthly_report, MEDIA_TYPES, STATEMENT_FORMATS
+from statements import StatementQueue, IdempotencyConflict
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -27,6 +30,13 @@ security = HTTPBearer()
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
 
+statement_queue = StatementQueue(
+    db,
+    storage_dir=Path(os.environ.get('STATEMENTS_DIR', ROOT_DIR / 'statement_files')),
+    concurrency=int(os.environ.get('STATEMENT_WORKERS', '4')),
+    max_attempts=int(os.environ.get('STATEMENT_MAX_ATTEMPTS', '3')),
+)
+
 # Models
 class UserRegister(BaseModel):
     email: EmailStr
@@ -86,6 +96,12 @@ class MonthlyReport(BaseModel):
     net_profit: float
     expenses_by_category: dict
 
+class StatementJobCreate(BaseModel):
+    month: str = Field(pattern=r'^\d{4}-(0[1-9]|1[0-2])$')  # YYYY-MM
+    format: str = 'pdf'  # 'csv', 'html' or 'pdf'
+    property_ids: Optional[List[str]] = None  # defaults to every property of the user
+    idempotency_key: Optional[str] = None  # resending the same key returns the same jobs instead of new ones
+
 # Auth helpers
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -221,25 +237,7 @@ async def update_property(property_id: str, prop_data: PropertyCreate, user_id:
 @api_router.get("/reports/monthly")
 async def get_monthly_report(month: str, user_id: str = Depends(get_current_user)):
     transactions = await db.transactions.find({'user_id': user_id, 'date': month}, {'_id': 0}).to_list(1000)
-    
-    total_income = sum(t['amount'] for t in transactions if t['type'] == 'income')
-    total_expenses = sum(t['amount'] for t in transactions if t['type'] == 'expense')
-    commission = total_income * 0.15
-    
-    expenses_by_category = {}
-    for t in transactions:
-        if t['type'] == 'expense' and t.get('category'):
-            cat = t['category']
-            expenses_by_category[cat] = expenses_by_category.get(cat, 0) + t['amount']
-    
-    return MonthlyReport(
-        month=month,
-        total_income=total_income,
-        total_expenses=total_expenses,
-        commission=commission,
-        net_profit=total_income - total_expenses - commission,
-        expenses_by_category=expenses_by_category
-    )
+    return MonthlyReport(**build_monthly_report(transactions, month))
 
 @api_router.get("/reports/income-by-month")
 async def get_income_by_month(user_id: str = Depends(get_current_user)):
@@ -295,6 +293,58 @@ async def get_income_by_property(month: str, user_id: str = Depends(get_current_
     
     return [{'property': k, 'income': v} for k, v in income_by_prop.items()]
 
+# Statement routes
+@api_router.post("/statements/jobs")
+async def enqueue_statements(job_data: StatementJobCreate, user_id: str = Depends(get_current_user)):
+    if job_data.format not in STATEMENT_FORMATS:
+        raise HTTPException(status_code=400, detail='Invalid format')
+    
+    query = {'user_id': user_id}
+    if job_data.property_ids is not None:
+        query['id'] = {'$in': job_data.property_ids}
+    properties = await db.properties.find(query, {'_id': 0, 'id': 1}).to_list(None)
+    if job_data.property_ids is not None:
+        missing = sorted(set(job_data.property_ids) - {p['id'] for p in properties})
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Property not found: {', '.join(missing)}")
+    if not properties:
+        raise HTTPException(status_code=404, detail='Property not found')
+    
+    try:
+        return await statement_queue.enqueue_many(
+            user_id, [p['id'] for p in properties], job_data.month, job_data.format, job_data.idempotency_key
+        )
+    except IdempotencyConflict:
+        raise HTTPException(status_code=409, detail='Idempotency key already used for a different statement')
+
+@api_router.get("/statements/jobs")
+async def get_statement_jobs(user_id: str = Depends(get_current_user), month: Optional[str] = None):
+    return await statement_queue.list_jobs(user_id, month)
+
+@api_router.get("/statements/jobs/{job_id}")
+async def get_statement_job(job_id: str, user_id: str = Depends(get_current_user)):
+    job = await statement_queue.get(user_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Job not found')
+    return job
+
+@api_router.get("/statements/jobs/{job_id}/download")
+async def download_statement(job_id: str, user_id: str = Depends(get_current_user)):
+    job = await statement_queue.get_file(user_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Job not found')
+    if job['status'] != 'done':
+        raise HTTPException(status_code=409, detail='Statement not ready')
+    
+    file_path = Path(job['file_path'])
+    if not file_path.is_file():
+        raise HTTPException(status_code=410, detail='Statement file missing')
+    return FileResponse(
+        file_path,
+        media_type=MEDIA_TYPES[job['format']],
+        filename=f"extrato-{job['month']}-{job['property_id']}.{job['format']}",
+    )
+
 app.include_router(api_router)
 
 app.add_middleware(
@@ -311,6 +361,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_statement_workers():
+    await statement_queue.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await statement_queue.stop()
     client.close()
\ No newline at end of file
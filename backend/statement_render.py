@@ -0,0 +1,147 @@
+import csv
+import html
+import io
+from pathlib import Path
+from typing import List
+
+COMMISSION_RATE = 0.15
+STATEMENT_FORMATS = ('csv', 'html', 'pdf')
+MEDIA_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'html': 'text/html; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+
+
+def build_monthly_report(transactions: List[dict], month: str) -> dict:
+    total_income = sum(t['amount'] for t in transactions if t['type'] == 'income')
+    total_expenses = sum(t['amount'] for t in transactions if t['type'] == 'expense')
+    commission = total_income * COMMISSION_RATE
+
+    expenses_by_category = {}
+    for t in transactions:
+        if t['type'] == 'expense' and t.get('category'):
+            cat = t['category']
+            expenses_by_category[cat] = expenses_by_category.get(cat, 0) + t['amount']
+
+    return {
+        'month': month,
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'commission': commission,
+        'net_profit': total_income - total_expenses - commission,
+        'expenses_by_category': expenses_by_category,
+    }
+
+
+# Renderers
+def format_brl(value: float) -> str:
+    formatted = f'{abs(value):,.2f}'.replace(',', '_').replace('.', ',').replace('_', '.')
+    return f'-R$ {formatted}' if value < 0 else f'R$ {formatted}'
+
+
+def statement_rows(property_name: str, report: dict) -> List[tuple]:
+    rows = [
+        ('Propriedade', property_name),
+        ('Mês', report['month']),
+        ('Receita Total', format_brl(report['total_income'])),
+    ]
+    for cat, amount in sorted(report['expenses_by_category'].items()):
+        rows.append((f'Despesa - {cat}', format_brl(amount)))
+    rows += [
+        ('Despesas Totais', format_brl(report['total_expenses'])),
+        (f'Comissão ({int(COMMISSION_RATE * 100)}%)', format_brl(report['commission'])),
+        ('Lucro Líquido', format_brl(report['net_profit'])),
+    ]
+    return rows
+
+
+def render_csv(property_name: str, report: dict) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['campo', 'valor'])
+    writer.writerow(['propriedade', property_name])
+    writer.writerow(['mes', report['month']])
+    writer.writerow(['receita_total', f"{report['total_income']:.2f}"])
+    for cat, amount in sorted(report['expenses_by_category'].items()):
+        writer.writerow([f'despesa:{cat}', f'{amount:.2f}'])
+    writer.writerow(['despesas_totais', f"{report['total_expenses']:.2f}"])
+    writer.writerow(['comissao', f"{report['commission']:.2f}"])
+    writer.writerow(['lucro_liquido', f"{report['net_profit']:.2f}"])
+    return buffer.getvalue().encode('utf-8')
+
+
+def render_html(property_name: str, report: dict) -> bytes:
+    body = ''.join(
+        f'<tr><th>{html.escape(label)}</th><td>{html.escape(value)}</td></tr>'
+        for label, value in statement_rows(property_name, report)
+    )
+    title = html.escape(f"Extrato {report['month']} - {property_name}")
+    return (
+        '<!DOCTYPE html><html lang="pt-BR"><head><meta charset="utf-8">'
+        f'<title>{title}</title>'
+        '<style>body{font-family:sans-serif}th{text-align:left;padding-right:2em}</style>'
+        f'</head><body><h1>{title}</h1><table>{body}</table></body></html>'
+    ).encode('utf-8')
+
+
+def _pdf_text(value: str) -> bytes:
+    raw = value.encode('cp1252', errors='replace')
+    return raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def render_pdf(property_name: str, report: dict, lines_per_page: int = 50) -> bytes:
+    # Minimal single-font PDF writer so statements don't need a PDF dependency.
+    lines = [f"Extrato {report['month']} - {property_name}", '']
+    lines += [f'{label}: {value}' for label, value in statement_rows(property_name, report)]
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # page tree, filled once page ids are known
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+    ]
+    page_ids = []
+    for page_lines in pages:
+        stream = b'BT /F1 11 Tf 14 TL 50 790 Td ' + b''.join(
+            b'(' + _pdf_text(line) + b') Tj T* ' for line in page_lines
+        ) + b'ET'
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b' '.join(b'%d 0 R' % pid for pid in page_ids)
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(page_ids))
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, obj)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+RENDERERS = {'csv': render_csv, 'html': render_html, 'pdf': render_pdf}
+
+
+def render_statement(fmt: str, property_name: str, report: dict) -> bytes:
+    return RENDERERS[fmt](property_name, report)
+
+
+def write_file(path: Path, content: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    tmp_path.write_bytes(content)
+    tmp_path.replace(path)
+
+
+def render_to_file(path: Path, fmt: str, property_name: str, transactions: List[dict], month: str):
+    report = build_monthly_report(transactions, month)
+    write_file(path, render_statement(fmt, property_name, report))
@@ -0,0 +1,270 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from statement_render import STATEMENT_FORMATS, render_to_file
+
+logger = logging.getLogger(__name__)
+
+# Internal bookkeeping that API responses must not expose (file_path is a server-side path).
+PRIVATE_FIELDS = ('file_path', 'lease_expires_at', 'max_attempts')
+JOB_PROJECTION = {'_id': 0, **{field: 0 for field in PRIVATE_FIELDS}}
+
+
+class StatementError(Exception):
+    """Permanent failure: the job is marked failed without further retries."""
+
+
+class IdempotencyConflict(Exception):
+    """An idempotency key was reused for a different property, month or format."""
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def public_job(job: dict) -> dict:
+    return {k: v for k, v in job.items() if k != '_id' and k not in PRIVATE_FIELDS}
+
+
+# Job queue
+class StatementQueue:
+    """Mongo-backed job queue that renders owner statements in the background.
+
+    Jobs live in ``db.statement_jobs``. Workers claim jobs atomically with
+    ``find_one_and_update`` and hold a lease while rendering, so a job whose
+    worker died is picked up again once the lease expires. Every claim bumps
+    ``attempts``, which also fences result writes: a worker whose lease was
+    taken over can no longer update the job.
+    """
+
+    def __init__(self, db, storage_dir: Path, concurrency: int = 4, max_attempts: int = 3,
+                 lease_seconds: int = 300, poll_interval: float = 2.0, retry_delay: float = 30.0,
+                 shutdown_timeout: float = 20.0):
+        self.db = db
+        self.storage_dir = Path(storage_dir)
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.shutdown_timeout = shutdown_timeout
+        # One token per enqueue wakes a single idle worker; a token put while every
+        # worker is busy stays queued, so no wakeup is lost.
+        self._wakeups: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+        self._stopping = False
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def jobs(self):
+        return self.db.statement_jobs
+
+    async def ensure_indexes(self):
+        await self.jobs.create_index([('user_id', ASCENDING), ('idempotency_key', ASCENDING)], unique=True)
+        await self.jobs.create_index([('status', ASCENDING), ('run_after', ASCENDING)])
+        await self.jobs.create_index('id', unique=True)
+        # Lookups made by every job in render()
+        await self.db.transactions.create_index(
+            [('user_id', ASCENDING), ('property_id', ASCENDING), ('date', ASCENDING)]
+        )
+        await self.db.properties.create_index('id')
+
+    def _key(self, idempotency_key: Optional[str], property_id: str) -> str:
+        return f'{idempotency_key}:{property_id}' if idempotency_key else str(uuid.uuid4())
+
+    async def enqueue_many(self, user_id: str, property_ids: List[str], month: str, fmt: str,
+                           idempotency_key: Optional[str] = None) -> List[dict]:
+        """Enqueue one statement per property, all under the same client idempotency key.
+
+        Every per-property key is checked before anything is inserted, so a key reused
+        for a different month or format is rejected without leaving orphan jobs behind.
+        """
+        if idempotency_key:
+            keys = [self._key(idempotency_key, pid) for pid in property_ids]
+            existing = await self.jobs.find(
+                {'user_id': user_id, 'idempotency_key': {'$in': keys}}, JOB_PROJECTION
+            ).to_list(None)
+            if any((job['month'], job['format']) != (month, fmt) for job in existing):
+                raise IdempotencyConflict(f'Idempotency key {idempotency_key} was used for a different statement')
+        return [
+            await self.enqueue(user_id, pid, month, fmt, self._key(idempotency_key, pid))
+            for pid in property_ids
+        ]
+
+    async def enqueue(self, user_id: str, property_id: str, month: str, fmt: str,
+                      idempotency_key: Optional[str] = None) -> dict:
+        if fmt not in STATEMENT_FORMATS:
+            raise ValueError(f'Unsupported format: {fmt}')
+        key = idempotency_key or str(uuid.uuid4())
+        timestamp = now_iso()
+        job = {
+            'id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'property_id': property_id,
+            'month': month,
+            'format': fmt,
+            'idempotency_key': key,
+            'status': 'queued',
+            'attempts': 0,
+            'max_attempts': self.max_attempts,
+            'error': None,
+            'file_path': None,
+            'run_after': timestamp,
+            'lease_expires_at': None,
+            'created_at': timestamp,
+            'updated_at': timestamp,
+            'completed_at': None,
+        }
+        try:
+            await self.jobs.insert_one(job)
+        except DuplicateKeyError:
+            job = await self.jobs.find_one({'user_id': user_id, 'idempotency_key': key}, JOB_PROJECTION)
+            if (job['property_id'], job['month'], job['format']) != (property_id, month, fmt):
+                raise IdempotencyConflict(f'Idempotency key {key} was used for a different statement')
+            # Same request already enqueued: hand back that job, re-queueing it only if it failed.
+            # attempts keeps counting up so it stays a valid fence against stale workers.
+            if job['status'] == 'failed':
+                job = await self.jobs.find_one_and_update(
+                    {'id': job['id'], 'status': 'failed'},
+                    {'$set': {'status': 'queued', 'max_attempts': job['attempts'] + self.max_attempts, 'error': None,
+                              'run_after': timestamp, 'updated_at': timestamp}},
+                    projection=JOB_PROJECTION,
+                    return_document=ReturnDocument.AFTER,
+                ) or job
+        self._notify()
+        return public_job(job)
+
+    async def get(self, user_id: str, job_id: str) -> Optional[dict]:
+        return await self.jobs.find_one({'id': job_id, 'user_id': user_id}, JOB_PROJECTION)
+
+    async def list_jobs(self, user_id: str, month: Optional[str] = None) -> List[dict]:
+        query = {'user_id': user_id}
+        if month:
+            query['month'] = month
+        return await self.jobs.find(query, JOB_PROJECTION).sort('created_at', -1).to_list(1000)
+
+    async def get_file(self, user_id: str, job_id: str) -> Optional[dict]:
+        """Job including its file_path, for the download endpoint only."""
+        return await self.jobs.find_one({'id': job_id, 'user_id': user_id}, {'_id': 0})
+
+    def _notify(self):
+        try:
+            self._wakeups.put_nowait(None)
+        except asyncio.QueueFull:
+            pass  # enough wakeups are already pending
+
+    async def claim(self) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        return await self.jobs.find_one_and_update(
+            {'$or': [
+                {'status': 'queued', 'run_after': {'$lte': now.isoformat()}},
+                {'status': 'running', 'lease_expires_at': {'$lte': now.isoformat()},
+                 '$expr': {'$lt': ['$attempts', '$max_attempts']}},
+            ]},
+            {'$set': {'status': 'running',
+                      'lease_expires_at': (now + timedelta(seconds=self.lease_seconds)).isoformat(),
+                      'updated_at': now.isoformat()},
+             '$inc': {'attempts': 1}},
+            projection={'_id': 0},
+            sort=[('run_after', ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def fail_expired(self) -> int:
+        """Fail running jobs whose lease expired on their last allowed attempt."""
+        now = now_iso()
+        result = await self.jobs.update_many(
+            {'status': 'running', 'lease_expires_at': {'$lte': now},
+             '$expr': {'$gte': ['$attempts', '$max_attempts']}},
+            {'$set': {'status': 'failed', 'error': 'Lease expired', 'lease_expires_at': None,
+                      'updated_at': now}},
+        )
+        return result.modified_count
+
+    async def _finish(self, job: dict, update: dict):
+        result = await self.jobs.update_one(
+            {'id': job['id'], 'attempts': job['attempts'], 'status': 'running'},
+            {'$set': update},
+        )
+        if result.matched_count == 0:
+            logger.warning('Statement job %s attempt %s lost its lease, result discarded', job['id'], job['attempts'])
+
+    async def process(self, job: dict):
+        try:
+            file_path = await self.render(job)
+        except Exception as exc:
+            permanent = isinstance(exc, StatementError) or job['attempts'] >= job['max_attempts']
+            if not permanent:
+                logger.warning('Statement job %s failed (attempt %s), retrying: %s', job['id'], job['attempts'], exc)
+            else:
+                logger.error('Statement job %s failed: %s', job['id'], exc)
+            run_after = datetime.now(timezone.utc) + timedelta(seconds=self.retry_delay * job['attempts'])
+            await self._finish(job, {'status': 'failed' if permanent else 'queued', 'error': str(exc),
+                                     'run_after': run_after.isoformat(), 'lease_expires_at': None,
+                                     'updated_at': now_iso()})
+            return
+        timestamp = now_iso()
+        await self._finish(job, {'status': 'done', 'file_path': str(file_path), 'error': None,
+                                 'lease_expires_at': None, 'updated_at': timestamp, 'completed_at': timestamp})
+
+    async def render(self, job: dict) -> Path:
+        prop = await self.db.properties.find_one({'id': job['property_id'], 'user_id': job['user_id']}, {'_id': 0})
+        if not prop:
+            raise StatementError('Property not found')
+        transactions = await self.db.transactions.find(
+            {'user_id': job['user_id'], 'property_id': job['property_id'], 'date': job['month']},
+            {'_id': 0},
+        ).to_list(None)
+        # One file per attempt, so a worker that lost its lease never overwrites the new owner's file.
+        file_path = self.storage_dir / job['user_id'] / f"{job['id']}-{job['attempts']}.{job['format']}"
+        await asyncio.to_thread(render_to_file, file_path, job['format'], prop['name'], transactions, job['month'])
+        return file_path
+
+    async def _worker(self, number: int):
+        while not self._stopping:
+            try:
+                job = await self.claim()
+            except Exception:
+                logger.exception('Statement worker %s could not claim a job', number)
+                job = None
+            if job is None:
+                try:
+                    await self.fail_expired()
+                except Exception:
+                    logger.exception('Statement worker %s could not expire stale jobs', number)
+                if self._stopping:
+                    break
+                try:
+                    await asyncio.wait_for(self._wakeups.get(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self.process(job)
+            except Exception:
+                logger.exception('Statement worker %s could not process job %s', number, job['id'])
+
+    async def start(self):
+        await self.ensure_indexes()
+        self._stopping = False
+        self._workers = [asyncio.create_task(self._worker(n)) for n in range(self.concurrency)]
+        logger.info('Started %s statement workers', self.concurrency)
+
+    async def stop(self):
+        # Let in-flight jobs finish so they don't sit in 'running' until the lease expires.
+        self._stopping = True
+        for _ in self._workers:
+            self._notify()
+        if self._workers:
+            _, pending = await asyncio.wait(self._workers, timeout=self.shutdown_timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._workers = []
+
@@ -1,6 +1,7 @@
 import requests
 import sys
 import json
+import time
 from datetime import datetime
 
 class AirbnbPropertyManagerTester:
@@ -11,6 +12,7 @@ class AirbnbPropertyManagerTester:
         self.user_id = None
         self.property_id = None
         self.transaction_id = None
+        self.statement_job_id = None
         self.tests_run = 0
         self.tests_passed = 0
 
@@ -295,6 +297,128 @@ class AirbnbPropertyManagerTester:
             return True
         return False
 
+    def test_statement_job_flow(self):
+        """Test enqueue -> poll -> download of a monthly statement"""
+        if not self.property_id:
+            print("❌ No property ID available for statement test")
+            return False
+        
+        job_data = {
+            "month": "2025-01",
+            "format": "pdf",
+            "property_ids": [self.property_id],
+            "idempotency_key": f"statement-test-{datetime.now().strftime('%H%M%S%f')}"
+        }
+        success, response = self.run_test(
+            "Enqueue Statement",
+            "POST",
+            "statements/jobs",
+            200,
+            data=job_data
+        )
+        if not success or len(response) != 1:
+            return False
+        self.statement_job_id = response[0]['id']
+        
+        # Downloading before a worker has finished the job is refused
+        self.tests_run += 1
+        url = f"{self.api_url}/statements/jobs/{self.statement_job_id}/download"
+        early = requests.get(url, headers={'Authorization': f'Bearer {self.token}'}, timeout=30)
+        _, job = self.run_test("Get Statement Job", "GET", f"statements/jobs/{self.statement_job_id}", 200)
+        if early.status_code == 409 or (early.status_code == 200 and job.get('status') == 'done'):
+            self.tests_passed += 1
+            print(f"✅ Passed - Early download returned {early.status_code}")
+        else:
+            print(f"❌ Failed - Early download returned {early.status_code}")
+        
+        success, response = self.run_test(
+            "Re-enqueue Statement (same key)",
+            "POST",
+            "statements/jobs",
+            200,
+            data=job_data
+        )
+        if success and [j['id'] for j in response] != [self.statement_job_id]:
+            print("❌ Idempotent re-enqueue created a new job")
+            return False
+        
+        self.run_test(
+            "Re-enqueue Statement (same key, other month)",
+            "POST",
+            "statements/jobs",
+            409,
+            data={**job_data, "month": "2025-02"}
+        )
+        
+        for _ in range(30):
+            _, job = self.run_test("Poll Statement Job", "GET", f"statements/jobs/{self.statement_job_id}", 200)
+            if job.get('status') in ('done', 'failed'):
+                break
+            time.sleep(1)
+        if job.get('status') != 'done':
+            print(f"❌ Statement job ended as {job.get('status')}: {job.get('error')}")
+            return False
+        
+        success, _ = self.run_test(
+            "Download Statement",
+            "GET",
+            f"statements/jobs/{self.statement_job_id}/download",
+            200
+        )
+        return success
+
+    def test_statement_validation(self):
+        """Test statement job input validation"""
+        success_month, _ = self.run_test(
+            "Enqueue Statement (invalid month)",
+            "POST",
+            "statements/jobs",
+            422,
+            data={"month": "2025-1", "format": "csv"}
+        )
+        success_prop, _ = self.run_test(
+            "Enqueue Statement (unknown property)",
+            "POST",
+            "statements/jobs",
+            404,
+            data={"month": "2025-01", "format": "csv", "property_ids": [self.property_id, "does-not-exist"]}
+        )
+        return success_month and success_prop
+
+    def test_statement_other_user(self):
+        """Test that another user cannot see or download a statement job"""
+        if not self.statement_job_id:
+            print("❌ No statement job ID available for access test")
+            return False
+        
+        timestamp = datetime.now().strftime('%H%M%S%f')
+        success, response = self.run_test(
+            "Register Second User",
+            "POST",
+            "auth/register",
+            200,
+            data={"email": f"other_user_{timestamp}@example.com", "password": "TestPass123!", "name": "Other User"}
+        )
+        if not success:
+            return False
+        other_headers = {'Authorization': f"Bearer {response['token']}"}
+        
+        success_get, _ = self.run_test(
+            "Get Statement Job (other user)",
+            "GET",
+            f"statements/jobs/{self.statement_job_id}",
+            404,
+            headers=other_headers
+        )
+        success_download, _ = self.run_test(
+            "Download Statement (other user)",
+            "GET",
+            f"statements/jobs/{self.statement_job_id}/download",
+            404,
+            headers=other_headers
+        )
+        return success_get and success_download
+
     def test_delete_transaction(self):
         """Test deleting a transaction"""
         if not self.transaction_id:
@@ -342,6 +466,9 @@ def main():
         ("Income by Month Report", tester.test_income_by_month_report),
         ("Expenses by Month Report", tester.test_expenses_by_month_report),
         ("Energy Comparison Report", tester.test_energy_comparison_report),
+        ("Statement Job Flow", tester.test_statement_job_flow),
+        ("Statement Validation", tester.test_statement_validation),
+        ("Statement Other User", tester.test_statement_other_user),
         ("Delete Transaction", tester.test_delete_transaction),
         ("Delete Property", tester.test_delete_property),
     ]
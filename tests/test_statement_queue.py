@@ -0,0 +1,361 @@
+import asyncio
+import sys
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('pymongo')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from pymongo.errors import DuplicateKeyError  # noqa: E402
+
+import statements  # noqa: E402
+from statements import IdempotencyConflict, StatementQueue  # noqa: E402
+
+USER = 'user-1'
+MONTH = '2025-01'
+
+
+# In-memory stand-in for the motor collections, covering only the queries StatementQueue makes.
+def _matches(doc, query):
+    for field, cond in query.items():
+        if field == '$or':
+            if not any(_matches(doc, sub) for sub in cond):
+                return False
+        elif field == '$expr':
+            (op, (left, right)), = cond.items()
+            a, b = doc.get(left[1:]), doc.get(right[1:])
+            if not {'$lt': a < b, '$gte': a >= b}[op]:
+                return False
+        elif isinstance(cond, dict):
+            value = doc.get(field)
+            for op, arg in cond.items():
+                if op == '$lte' and (value is None or not value <= arg):
+                    return False
+                if op == '$in' and value not in arg:
+                    return False
+        elif doc.get(field) != cond:
+            return False
+    return True
+
+
+def _project(doc, projection):
+    if projection is None:
+        return dict(doc)
+    return {k: v for k, v in doc.items() if projection.get(k, 1)}
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs.sort(key=lambda d: d.get(field), reverse=direction < 0)
+        return self
+
+    async def to_list(self, length):
+        return self.docs if length is None else self.docs[:length]
+
+
+class FakeCollection:
+    def __init__(self, unique=None):
+        self.docs = []
+        self.unique = unique
+
+    async def create_index(self, *args, **kwargs):
+        pass
+
+    async def insert_one(self, doc):
+        if self.unique and any(all(d.get(k) == doc.get(k) for k in self.unique) for d in self.docs):
+            raise DuplicateKeyError('duplicate key')
+        doc['_id'] = len(self.docs) + 1
+        self.docs.append(dict(doc))
+
+    def find(self, query, projection=None):
+        return FakeCursor([_project(d, projection) for d in self.docs if _matches(d, query)])
+
+    async def find_one(self, query, projection=None):
+        found = [d for d in self.docs if _matches(d, query)]
+        return _project(found[0], projection) if found else None
+
+    async def find_one_and_update(self, query, update, projection=None, sort=None, return_document=False):
+        found = [d for d in self.docs if _matches(d, query)]
+        for field, direction in reversed(sort or []):
+            found.sort(key=lambda d: d.get(field), reverse=direction < 0)
+        if not found:
+            return None
+        self._apply(found[0], update)
+        return _project(found[0], projection)
+
+    async def update_one(self, query, update):
+        found = [d for d in self.docs if _matches(d, query)][:1]
+        for doc in found:
+            self._apply(doc, update)
+        return SimpleNamespace(matched_count=len(found), modified_count=len(found))
+
+    async def update_many(self, query, update):
+        found = [d for d in self.docs if _matches(d, query)]
+        for doc in found:
+            self._apply(doc, update)
+        return SimpleNamespace(matched_count=len(found), modified_count=len(found))
+
+    @staticmethod
+    def _apply(doc, update):
+        doc.update(update.get('$set', {}))
+        for field, amount in update.get('$inc', {}).items():
+            doc[field] = doc.get(field, 0) + amount
+
+
+def make_db():
+    db = SimpleNamespace(
+        statement_jobs=FakeCollection(unique=('user_id', 'idempotency_key')),
+        properties=FakeCollection(),
+        transactions=FakeCollection(),
+    )
+    db.properties.docs.append({'id': 'prop-1', 'user_id': USER, 'name': 'Flat 101'})
+    db.transactions.docs += [
+        {'user_id': USER, 'property_id': 'prop-1', 'type': 'income', 'amount': 1000.0, 'date': MONTH},
+        {'user_id': USER, 'property_id': 'prop-1', 'type': 'expense', 'category': 'Luz',
+         'amount': 100.0, 'date': MONTH},
+    ]
+    return db
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return StatementQueue(make_db(), tmp_path, max_attempts=3, lease_seconds=60, retry_delay=30)
+
+
+def stored(queue, job_id):
+    return next(d for d in queue.db.statement_jobs.docs if d['id'] == job_id)
+
+
+def broken_render(*args):
+    raise OSError('disk full')
+
+
+def expire_lease(queue, job_id):
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    stored(queue, job_id)['lease_expires_at'] = past.isoformat()
+
+
+def test_process_renders_and_marks_done(queue):
+    async def scenario():
+        job = await queue.enqueue(USER, 'prop-1', MONTH, 'csv')
+        claimed = await queue.claim()
+        await queue.process(claimed)
+        return job
+
+    job = asyncio.run(scenario())
+
+    doc = stored(queue, job['id'])
+    assert doc['status'] == 'done'
+    assert doc['attempts'] == 1
+    assert Path(doc['file_path']).read_bytes().endswith(b'lucro_liquido,750.00\r\n')
+
+
+def test_enqueue_and_get_hide_private_fields(queue):
+    async def scenario():
+        job = await queue.enqueue(USER, 'prop-1', MONTH, 'csv')
+        await queue.process(await queue.claim())
+        return job, await queue.get(USER, job['id']), await queue.list_jobs(USER)
+
+    job, fetched, listed = asyncio.run(scenario())
+
+    for public in (job, fetched, listed[0]):
+        assert not {'_id', 'file_path', 'lease_expires_at', 'max_attempts'} & public.keys()
+    assert fetched['status'] == 'done'
+
+
+def test_transient_failure_is_retried_later(queue, monkeypatch):
+    monkeypatch.setattr(statements, 'render_to_file', broken_render)
+
+    async def scenario():
+        job = await queue.enqueue(USER, 'prop-1', MONTH, 'pdf')
+        await queue.process(await queue.claim())
+        return job, await queue.claim()
+
+    before = datetime.now(timezone.utc)
+    job, reclaimed = asyncio.run(scenario())
+
+    doc = stored(queue, job['id'])
+    assert doc['status'] == 'queued'
+    assert doc['attempts'] == 1
+    assert doc['error'] == 'disk full'
+    assert datetime.fromisoformat(doc['run_after']) >= before + timedelta(seconds=30)
+    assert reclaimed is None  # not due until run_after
+
+
+def test_failure_on_last_attempt_is_permanent(queue, monkeypatch):
+    monkeypatch.setattr(statements, 'render_to_file', broken_render)
+
+    async def scenario():
+        job = await queue.enqueue(USER, 'prop-1', MONTH, 'pdf')
+        for _ in range(3):
+            stored(queue, job['id'])['run_after'] = statements.now_iso()
+            await queue.process(await queue.claim())
+        return job
+
+    job = asyncio.run(scenario())
+
+    doc = stored(queue, job['id'])
+    assert doc['status'] == 'failed'
+    assert doc['attempts'] == 3
+
+
+def test_statement_error_fails_without_retry(queue):
+    async def scenario():
+        job = await queue.enqueue(USER, 'missing-prop', MONTH, 'html')
+        await queue.process(await queue.claim())
+        return job
+
+    job = asyncio.run(scenario())
+
+    doc = stored(queue, job['id'])
+    assert doc['status'] == 'failed'
+    assert doc['attempts'] == 1
+    assert doc['error'] == 'Property not found'
+
+
+def test_expired_lease_is_reclaimed_until_attempts_run_out(queue):
+    async def scenario():
+        job = await queue.enqueue(USER, 'prop-1', MONTH, 'csv')
+        claims = []
+        for _ in range(3):
+            claims.append(await queue.claim())
+            expire_lease(queue, job['id'])
+        return job, claims, await queue.claim(), await queue.fail_expired()
+
+    job, claims, extra_claim, expired = asyncio.run(scenario())
+
+    assert [c['attempts'] for c in claims] == [1, 2, 3]
+    assert extra_claim is None
+    assert expired == 1
+    doc = stored(queue, job['id'])
+    assert doc['status'] == 'failed'
+    assert doc['attempts'] == 3
+    assert doc['error'] == 'Lease expired'
+
+
+def test_fail_expired_ignores_leases_with_attempts_left(queue):
+    async def scenario():
+        job = await queue.enqueue(USER, 'prop-1', MONTH, 'csv')
+        await queue.claim()
+        expire_lease(queue, job['id'])
+        return job, await queue.fail_expired()
+
+    job, expired = asyncio.run(scenario())
+
+    assert expired == 0
+    assert stored(queue, job['id'])['status'] == 'running'
+
+
+def test_stale_worker_result_is_discarded(queue):
+    async def scenario():
+        job = await queue.enqueue(USER, 'prop-1', MONTH, 'csv')
+        stale = await queue.claim()
+        expire_lease(queue, job['id'])
+        current = await queue.claim()
+
+        await queue.process(stale)
+        after_stale = dict(stored(queue, job['id']))
+        await queue.process(current)
+        return job, after_stale
+
+    job, after_stale = asyncio.run(scenario())
+
+    assert after_stale['status'] == 'running'
+    assert after_stale['attempts'] == 2
+    assert after_stale['file_path'] is None
+    doc = stored(queue, job['id'])
+    assert doc['status'] == 'done'
+    assert doc['file_path'].endswith(f"{job['id']}-2.csv")
+
+
+def test_stale_worker_failure_does_not_requeue_finished_job(queue, monkeypatch):
+    async def scenario():
+        job = await queue.enqueue(USER, 'prop-1', MONTH, 'csv')
+        stale = await queue.claim()
+        expire_lease(queue, job['id'])
+        await queue.process(await queue.claim())
+
+        monkeypatch.setattr(statements, 'render_to_file', broken_render)
+        await queue.process(stale)
+        return job
+
+    job = asyncio.run(scenario())
+
+    doc = stored(queue, job['id'])
+    assert doc['status'] == 'done'
+    assert doc['error'] is None
+
+
+def test_enqueue_same_key_returns_existing_job(queue):
+    async def scenario():
+        first = await queue.enqueue(USER, 'prop-1', MONTH, 'csv', 'key-1')
+        second = await queue.enqueue(USER, 'prop-1', MONTH, 'csv', 'key-1')
+        fresh = await queue.enqueue(USER, 'prop-1', MONTH, 'csv')
+        return first, second, fresh
+
+    first, second, fresh = asyncio.run(scenario())
+
+    assert second['id'] == first['id']
+    assert fresh['id'] != first['id']
+
+
+def test_enqueue_requeues_failed_job_with_more_attempts(queue):
+    async def scenario():
+        job = await queue.enqueue(USER, 'missing-prop', MONTH, 'csv', 'key-1')
+        await queue.process(await queue.claim())
+        stored(queue, job['id'])['attempts'] = 3  # as if it had used up every attempt
+        return job, await queue.enqueue(USER, 'missing-prop', MONTH, 'csv', 'key-1')
+
+    job, again = asyncio.run(scenario())
+
+    assert again['id'] == job['id']
+    doc = stored(queue, job['id'])
+    assert doc['status'] == 'queued'
+    assert doc['attempts'] == 3
+    assert doc['max_attempts'] == 6
+    assert doc['error'] is None
+
+
+def test_enqueue_rejects_key_reused_for_other_statement(queue):
+    async def scenario():
+        await queue.enqueue(USER, 'prop-1', MONTH, 'csv', 'key-1')
+        await queue.enqueue(USER, 'prop-1', '2025-02', 'csv', 'key-1')
+
+    with pytest.raises(IdempotencyConflict):
+        asyncio.run(scenario())
+
+
+def test_enqueue_many_conflict_inserts_nothing(queue):
+    async def scenario():
+        await queue.enqueue_many(USER, ['prop-2'], MONTH, 'csv', 'batch')
+        await queue.enqueue_many(USER, ['prop-1', 'prop-2'], MONTH, 'pdf', 'batch')
+
+    with pytest.raises(IdempotencyConflict):
+        asyncio.run(scenario())
+
+    assert [d['property_id'] for d in queue.db.statement_jobs.docs] == ['prop-2']
+
+
+def test_worker_wakes_on_enqueue_and_stops(queue):
+    queue.poll_interval = 60  # only an enqueue wakeup can get the job done in time
+
+    async def scenario():
+        await queue.start()
+        await asyncio.sleep(0)
+        job = await queue.enqueue(USER, 'prop-1', MONTH, 'csv')
+        for _ in range(200):
+            if stored(queue, job['id'])['status'] == 'done':
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.wait_for(queue.stop(), timeout=5)
+        return job
+
+    job = asyncio.run(scenario())
+
+    assert stored(queue, job['id'])['status'] == 'done'
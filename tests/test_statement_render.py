@@ -0,0 +1,94 @@
+import csv
+import io
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from statement_render import build_monthly_report, format_brl, render_csv, render_html, render_pdf  # noqa: E402
+
+TRANSACTIONS = [
+    {'type': 'income', 'amount': 2500.0, 'date': '2025-01'},
+    {'type': 'income', 'amount': 500.0, 'date': '2025-01'},
+    {'type': 'expense', 'category': 'Limpeza', 'amount': 150.0, 'date': '2025-01'},
+    {'type': 'expense', 'category': 'Limpeza', 'amount': 50.0, 'date': '2025-01'},
+    {'type': 'expense', 'category': 'Luz', 'amount': 180.0, 'date': '2025-01'},
+    {'type': 'expense', 'category': None, 'amount': 20.0, 'date': '2025-01'},
+]
+
+
+def test_build_monthly_report_matches_previous_totals():
+    report = build_monthly_report(TRANSACTIONS, '2025-01')
+
+    assert report == {
+        'month': '2025-01',
+        'total_income': 3000.0,
+        'total_expenses': 400.0,
+        'commission': 450.0,
+        'net_profit': 2150.0,
+        # Uncategorised expenses count towards the total but not the breakdown.
+        'expenses_by_category': {'Limpeza': 200.0, 'Luz': 180.0},
+    }
+
+
+def test_build_monthly_report_empty_month():
+    report = build_monthly_report([], '2025-02')
+
+    assert report['total_income'] == 0
+    assert report['net_profit'] == 0
+    assert report['expenses_by_category'] == {}
+
+
+@pytest.mark.parametrize('value, expected', [
+    (0, 'R$ 0,00'),
+    (12345.6, 'R$ 12.345,60'),
+    (1234567.891, 'R$ 1.234.567,89'),
+    (-150.5, '-R$ 150,50'),
+    (-1234.5, '-R$ 1.234,50'),
+])
+def test_format_brl(value, expected):
+    assert format_brl(value) == expected
+
+
+def test_render_csv_quotes_fields():
+    report = build_monthly_report(TRANSACTIONS, '2025-01')
+
+    content = render_csv('Flat, "Centro"', report).decode('utf-8')
+    rows = list(csv.reader(io.StringIO(content)))
+
+    assert rows[1] == ['propriedade', 'Flat, "Centro"']
+    assert ['despesa:Limpeza', '200.00'] in rows
+    assert rows[-1] == ['lucro_liquido', '2150.00']
+
+
+def test_render_html_escapes_property_name():
+    report = build_monthly_report(TRANSACTIONS, '2025-01')
+
+    content = render_html('<script>alert(1)</script> & Co', report).decode('utf-8')
+
+    assert '<script>' not in content
+    assert '&lt;script&gt;alert(1)&lt;/script&gt; &amp; Co' in content
+    assert 'R$ 2.150,00' in content
+
+
+@pytest.mark.parametrize('lines_per_page', [50, 3])
+def test_render_pdf_xref_points_at_objects(lines_per_page):
+    report = build_monthly_report(TRANSACTIONS, '2025-01')
+
+    content = render_pdf('Casa (praia) \\ Água', report, lines_per_page=lines_per_page)
+
+    assert content.startswith(b'%PDF-1.4\n')
+    assert content.endswith(b'%%EOF\n')
+    xref = int(re.search(rb'startxref\n(\d+)\n', content).group(1))
+    assert content[xref:].startswith(b'xref\n')
+    offsets = [int(offset) for offset in re.findall(rb'(\d{10}) 00000 n ', content)]
+    size = int(re.search(rb'/Size (\d+)', content).group(1))
+    assert len(offsets) == size - 1
+    for number, offset in enumerate(offsets, start=1):
+        assert content[offset:].startswith(b'%d 0 obj\n' % number)
+    pages = int(re.search(rb'/Count (\d+)', content).group(1))
+    assert pages == len(re.findall(rb'/Type /Page ', content))
+    assert b'Casa \\(praia\\) \\\\ \xc1gua' in content